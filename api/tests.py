@@ -1,14 +1,20 @@
 """Tests."""
 import base64
-import random
-from unittest.mock import MagicMock, patch
+from unittest.mock import patch
 
+import numpy as np
+import pytest
+import orjson
 from django.contrib.auth import hashers, models
+from django.core.cache import cache
+from django.test import override_settings
 from django.urls import reverse
 from model_bakery import baker
 from requests import ConnectionError, exceptions
 from rest_framework import HTTP_HEADER_ENCODING, status, test
 
+from api.views import ForecastView
+
 
 def create_test_user_account():
     """Create a system user."""
@@ -17,209 +23,246 @@ def create_test_user_account():
         password=hashers.make_password('123'))
 
 
-def add_auth_credentials(client):
-    """Add authentication information to the client."""
-    credentials = 'tester:123'
-    base64_credentials = base64.b64encode(
-        credentials.encode(HTTP_HEADER_ENCODING)).decode(HTTP_HEADER_ENCODING)
-
-    client.credentials(HTTP_AUTHORIZATION=f'Basic {base64_credentials}')
-
-    return client
-
-
+# The Basic auth header for the test user never changes, so encode it
+# once at import time instead of in every test.
+AUTH_HEADER = 'Basic ' + base64.b64encode(
+    'tester:123'.encode(HTTP_HEADER_ENCODING)).decode(HTTP_HEADER_ENCODING)
+
+
+class FakeResponse:
+    """Minimal stand-in for ``requests.Response`` in mocked tests.
+
+    A plain class with fixed attributes avoids MagicMock's attribute
+    synthesis cost and makes the mocked surface explicit: the view
+    only touches ``content``, ``raise_for_status`` and, on the error
+    path, ``json``/``reason``.
+    """
+
+    def __init__(self, data=None, reason='', json_error=False):
+        """Store the canned payload and error behaviour."""
+        self.content = orjson.dumps(data) if data is not None else b''
+        self.reason = reason
+        self._data = data
+        self._json_error = json_error
+
+    def json(self):
+        """Return the canned payload, or fail like a non-JSON body."""
+        if self._json_error:
+            raise ValueError('No JSON object could be decoded')
+        return self._data
+
+    def raise_for_status(self):
+        """Behave like a 2xx response and never raise."""
+
+
+def make_forecast_fixture(days, seed):
+    """Build a deterministic forecast payload and its expected stats.
+
+    The hourly temperatures are drawn from a seeded RNG so the fixture
+    is reproducible, and the expected maximum, minimum, average and
+    median are derived from the same flat array the API aggregates.
+    """
+    rng = np.random.default_rng(seed)
+    hourly_temps = np.round(rng.uniform(5, 30, size=days * 24), 1)
+
+    payload = {'forecast': {'forecastday': []}}
+    for day in range(days):
+        day_temps = hourly_temps[day * 24:(day + 1) * 24]
+        payload['forecast']['forecastday'].append({
+            'day': {
+                'maxtemp_c': float(day_temps.max()),
+                'mintemp_c': float(day_temps.min()),
+                'avgtemp_c': round(float(day_temps.mean()), 1),
+            },
+            'hour': [{'temp_c': float(temp)} for temp in day_temps],
+        })
+
+    middle_position = hourly_temps.size // 2
+    expected_stats = {
+        'maximum': float(hourly_temps.max()),
+        'minimum': float(hourly_temps.min()),
+        'average': round(float(hourly_temps.mean()), 1),
+        'median': round(float(
+            hourly_temps[middle_position - 1]
+            + hourly_temps[middle_position]) / 2, 1),
+    }
+
+    return payload, expected_stats
+
+
+# The default PBKDF2 hasher is deliberately slow; tests only need a
+# password that round-trips, so use the fast MD5 hasher instead.
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
 class WeatherForecastAPITests(test.APITestCase):
     """Test Class for Weather forecasting API."""
 
+    # The validation tests only exercise ``validate_days``, so they
+    # call the view directly through a request factory instead of
+    # paying for URL resolution and the middleware stack. The success
+    # and error-path tests still go through the client to keep the
+    # routing covered.
+    factory = test.APIRequestFactory()
+    auth_header = AUTH_HEADER
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create the API user once for the class.
+
+        ``setUpTestData`` runs a single time per class and each test is
+        wrapped in a rolled-back savepoint, so the password hash (the
+        dominant fixture cost) is only computed once.
+        """
+        cls.test_user = create_test_user_account()
+        cls.url = reverse('list-forecast', args=('LONDON', ))
+        cls.forecast_5_days, cls.expected_5_days = make_forecast_fixture(
+            days=5, seed=1)
+        cls.forecast_2_days, cls.expected_2_days = make_forecast_fixture(
+            days=2, seed=2)
+
     def setUp(self):
-        """Create API user."""
-        self.test_user = create_test_user_account()
+        """Start each test with an empty forecast cache."""
+        cache.clear()
 
     def test_unauthenticated_client(self):
         """Attempt to access the API via an unauthorized client."""
-        url = reverse('list-forecast', args=('LONDON', ))
-        response = self.client.get(url)
+        request = self.factory.get('/api/locations/LONDON/')
+        response = ForecastView.as_view()(request, city='LONDON')
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
     def test_authenticated_client__days_not_supplied(self):
         """Attempt to access the API without supplying the number of days."""
-        url = reverse('list-forecast', args=('LONDON', ))
-        self.client = add_auth_credentials(self.client)
-        response = self.client.get(url)
+        request = self.factory.get('/api/locations/LONDON/')
+        test.force_authenticate(request, user=self.test_user)
+        response = ForecastView.as_view()(request, city='LONDON')
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data, 'Number of days has not been supplied.')
 
     def test_more_than_14_days_supplied(self):
         """Attemp to get forecast for more that 14 days in the future."""
-        url = reverse('list-forecast', args=('LONDON', ))
-        url = url + '?days=20'
-        self.client = add_auth_credentials(self.client)
-        response = self.client.get(url)
+        request = self.factory.get('/api/locations/LONDON/', {'days': '20'})
+        test.force_authenticate(request, user=self.test_user)
+        response = ForecastView.as_view()(request, city='LONDON')
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data, 'The API can only forecast up to 14 days.')
 
     def test_less_than_one_days_provided(self):
         """Attemp to get forecast for more that 14 days in the future."""
-        url = reverse('list-forecast', args=('LONDON', ))
-        url = url + '?days=-1'
-        self.client = add_auth_credentials(self.client)
-        response = self.client.get(url)
+        request = self.factory.get('/api/locations/LONDON/', {'days': '-1'})
+        test.force_authenticate(request, user=self.test_user)
+        response = ForecastView.as_view()(request, city='LONDON')
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data, 'Number of days should range from 1 to 14.')
 
     def test_non_numeric_value_passed_as_number_of_days(self):
         """Attemp to access the API using an invalid number of days."""
-        url = reverse('list-forecast', args=('LONDON', ))
-        url = url + '?days=xyz'
-        self.client = add_auth_credentials(self.client)
-        response = self.client.get(url)
+        request = self.factory.get('/api/locations/LONDON/', {'days': 'xyz'})
+        test.force_authenticate(request, user=self.test_user)
+        response = ForecastView.as_view()(request, city='LONDON')
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data, 'Invalid number of days provided.')
 
-    @patch('api.views.requests')
-    def test_public_api_throws_a_connection_error(self, requests_mock):
+    def test_digit_like_non_decimal_value_passed_as_number_of_days(self):
+        """Attemp to access the API using superscript digits as days.
+
+        str.isdigit is True for these characters but int() rejects
+        them, so they must fail validation rather than raise.
+        """
+        request = self.factory.get('/api/locations/LONDON/', {'days': '²'})
+        test.force_authenticate(request, user=self.test_user)
+        response = ForecastView.as_view()(request, city='LONDON')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, 'Invalid number of days provided.')
+
+    @patch('api.views.SESSION')
+    def test_public_api_throws_a_connection_error(self, session_mock):
         """Test Connection error."""
-        requests_mock.get.side_effect = ConnectionError('errrr!')
+        session_mock.get.side_effect = ConnectionError('errrr!')
 
-        url = reverse('list-forecast', args=('LONDON', ))
-        url = url + '?days=10'
-        self.client = add_auth_credentials(self.client)
+        url = self.url + '?days=10'
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth_header)
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    @patch('api.views.requests')
-    def test_public_api_throws_a_httperror(self, requests_mock):
+    @patch('api.views.SESSION')
+    def test_public_api_throws_a_httperror(self, session_mock):
         """Test HTTPError."""
         exc = exceptions.HTTPError('errrr!')
-        exc.response = MagicMock()
-        exc.response.json.return_value = {
-            'error': {'code': 5000, 'message': 'Business error'}
-        }
+        exc.response = FakeResponse(
+            data={'error': {'code': 5000, 'message': 'Business error'}})
 
-        requests_mock.get.side_effect = exc
+        session_mock.get.side_effect = exc
 
-        url = reverse('list-forecast', args=('LONDON', ))
-        url = url + '?days=10'
-        self.client = add_auth_credentials(self.client)
+        url = self.url + '?days=10'
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth_header)
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data, 'Business error')
 
-    @patch('api.views.requests')
+    @patch('api.views.SESSION')
     def test_public_api_throws_a_httperror_with_non_json_response(
-            self, requests_mock):
+            self, session_mock):
         """Test response for unserializable HTTPError."""
         exc = exceptions.HTTPError('errrr!')
-        exc.response = MagicMock()
-        exc.response.json.side_effect = Exception()
-        exc.response.reason = 'Not found'
+        exc.response = FakeResponse(reason='Not found', json_error=True)
 
-        requests_mock.get.side_effect = exc
+        session_mock.get.side_effect = exc
 
-        url = reverse('list-forecast', args=('LONDON', ))
-        url = url + '?days=10'
-        self.client = add_auth_credentials(self.client)
+        url = self.url + '?days=10'
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth_header)
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data, 'Not found')
 
-    @patch('api.views.requests')
-    def test_construct_forecast_payload_fails(self, requests_mock):
+    @patch('api.views.SESSION')
+    def test_construct_forecast_payload_fails(self, session_mock):
         """Test un-expected api response."""
-        malformed_api_response = MagicMock()
-        malformed_api_response.json.return_value = {}
-        requests_mock.get.return_value = malformed_api_response
+        session_mock.get.return_value = FakeResponse(data={})
 
-        url = reverse('list-forecast', args=('LONDON', ))
-        url = url + '?days=5'
-        self.client = add_auth_credentials(self.client)
+        url = self.url + '?days=5'
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth_header)
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
         self.assertEqual(response.data, 'Internal server error.')
 
-    @patch('api.views.requests')
-    def test_get_aggregated_weather_forecast(self, requests_mock):
+    @pytest.mark.slow
+    @patch('api.views.SESSION')
+    def test_get_aggregated_weather_forecast(self, session_mock):
         """Test core logic of the API with multiple forecasts."""
-        api_response = MagicMock()
-        FORECAST_DATA = {
-            'forecast': {
-                'forecastday': []
-            }
-        }
+        session_mock.get.return_value = FakeResponse(data=self.forecast_5_days)
 
-        # Create random sample forecast data for 5 days.
-        for _ in range(0, 5):
-            daily_data = {
-                'day': {
-                    'maxtemp_c': round(random.uniform(20, 30), 1),
-                    'mintemp_c': round(random.uniform(1, 9), 1),
-                    'avgtemp_c': round(random.uniform(10, 19), 1),
-                },
-                'hour': []
-            }
-            for _ in range(0, 24):
-                hourly_data = {
-                    'temp_c': round(random.uniform(5, 30), 1)
-                }
-
-                daily_data['hour'].append(hourly_data)
-
-            FORECAST_DATA['forecast']['forecastday'].append(daily_data)
-
-        api_response.json.return_value = FORECAST_DATA
-        requests_mock.get.return_value = api_response
-
-        # The median temperature will be average temperature
-        # recorded at the 12th hour and 13th hour of the 3rd day.
-        temp_sum = FORECAST_DATA['forecast'][
-            'forecastday'][2]['hour'][11]['temp_c'] + FORECAST_DATA['forecast'][
-            'forecastday'][2]['hour'][12]['temp_c']
-        expected_median = round(temp_sum / 2, 1)
-
-        # The expected maximum temperature will be the highest maxtemp_c
-        # across the 5 days
-        expected_maxtemp = max([
-            i['day']['maxtemp_c'] for i in FORECAST_DATA['forecast']['forecastday']])
-
-        # The expected minimum temperature will be the lowest mintemp_c
-        # across the 5 days
-        expected_mintemp = min([
-            i['day']['mintemp_c'] for i in FORECAST_DATA['forecast']['forecastday']])
-
-        # The expected average temperature will be the
-        # total hourly temperatures across the 5 days divided by
-        # the number of hours (5*24)
-        running_sum = 0
-        for i in FORECAST_DATA['forecast']['forecastday']:
-            for j in i['hour']:
-                running_sum += j['temp_c']
-        expected_avgtemp = round(running_sum/(5*24), 1)
+        url = self.url + '?days=5'
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth_header)
+        actual_response = self.client.get(url)
+        self.assertEqual(self.expected_5_days, actual_response.data)
 
-        expected_response = {
-            'maximum': expected_maxtemp,
-            'minimum': expected_mintemp,
-            'average': expected_avgtemp,
-            'median': expected_median,
-        }
+    @patch('api.views.SESSION')
+    def test_repeat_request_is_served_from_cache(self, session_mock):
+        """Test that a repeat request within the TTL skips upstream."""
+        session_mock.get.return_value = FakeResponse(data=self.forecast_5_days)
 
-        url = reverse('list-forecast', args=('LONDON', ))
-        url = url + '?days=5'
-        self.client = add_auth_credentials(self.client)
-        actual_response = self.client.get(url)
-        self.assertEqual(expected_response, actual_response.data)
+        url = self.url + '?days=5'
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth_header)
+        first_response = self.client.get(url)
+        second_response = self.client.get(url)
 
-    @patch('api.views.requests')
-    def test_get_aggregated_weather_forecast_trivial_example(self, requests_mock):
+        self.assertEqual(session_mock.get.call_count, 1)
+        self.assertEqual(first_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(second_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(second_response.data, first_response.data)
+
+    @patch('api.views.SESSION')
+    def test_get_aggregated_weather_forecast_trivial_example(self, session_mock):
         """Tests core logic with manual data from a single day."""
-        api_response = MagicMock()
         FORECAST_DATA = {
             'forecast': {
                 'forecastday': [{
@@ -239,7 +282,7 @@ class WeatherForecastAPITests(test.APITestCase):
                             {'temp_c': 10.0},
                             {'temp_c': 21.0},
                             {'temp_c': 10.3},
-                            {'temp_c': 3.8},  # .. Median
+                            {'temp_c': 3.8},  # .. Median, Lowest
                             {'temp_c': 8.3},  # .. Median
                             {'temp_c': 10.5},
                             {'temp_c': 10.7},
@@ -249,7 +292,7 @@ class WeatherForecastAPITests(test.APITestCase):
                             {'temp_c': 6.0},
                             {'temp_c': 10.0},
                             {'temp_c': 10.9},
-                            {'temp_c': 3.9},  # .. Lowest
+                            {'temp_c': 3.9},
                             {'temp_c': 10.1},
                             {'temp_c': 34.2},  # .. Highest
                         ]
@@ -265,7 +308,7 @@ class WeatherForecastAPITests(test.APITestCase):
         expected_maxtemp = 34.2
 
         # Lowest hourly temperature within the the day
-        expected_mintemp = 3.9
+        expected_mintemp = 3.8
 
         # Sum of all hourly temperatures divided by 24
         expected_avgtemp = 11.3
@@ -277,58 +320,24 @@ class WeatherForecastAPITests(test.APITestCase):
             'median': expected_median,
         }
 
-        api_response.json.return_value = FORECAST_DATA
-        requests_mock.get.return_value = api_response
+        session_mock.get.return_value = FakeResponse(data=FORECAST_DATA)
 
-        url = reverse('list-forecast', args=('LONDON', ))
-        url = url + '?days=5'
-        self.client = add_auth_credentials(self.client)
+        url = self.url + '?days=5'
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth_header)
         actual_response = self.client.get(url)
         self.assertEqual(expected_response, actual_response.data)
 
-    @patch('api.views.requests')
-    def test_median_temperature_for_even_number_of_days(self, requests_mock):
+    @pytest.mark.slow
+    @patch('api.views.SESSION')
+    def test_median_temperature_for_even_number_of_days(self, session_mock):
         """Test median computation with data from an even number of days."""
-        api_response = MagicMock()
-        FORECAST_DATA = {
-            'forecast': {
-                'forecastday': []
-            }
-        }
-
-        # Create random sample forecast data for 2 days.
-        for _ in range(0, 2):
-            daily_data = {
-                'day': {
-                    'maxtemp_c': round(random.uniform(20, 30), 1),
-                    'mintemp_c': round(random.uniform(1, 9), 1),
-                    'avgtemp_c': round(random.uniform(10, 19), 1),
-                },
-                'hour': []
-            }
-            for _ in range(0, 24):
-                hourly_data = {
-                    'temp_c': round(random.uniform(5, 30), 1)
-                }
-
-                daily_data['hour'].append(hourly_data)
-
-            FORECAST_DATA['forecast']['forecastday'].append(daily_data)
-
-        api_response.json.return_value = FORECAST_DATA
-        requests_mock.get.return_value = api_response
+        session_mock.get.return_value = FakeResponse(data=self.forecast_2_days)
 
         # The median temperature will be the average temperature
         # recorded at the last hour of the 1st day and the 1st hour
         # of the 2nd day.
-        temp_sum = FORECAST_DATA['forecast'][
-            'forecastday'][0]['hour'][23]['temp_c'] + FORECAST_DATA['forecast'][
-            'forecastday'][1]['hour'][0]['temp_c']
-        expected_median = round(temp_sum / 2, 1)
-
-        url = reverse('list-forecast', args=('LONDON', ))
-        url = url + '?days=5'
-        self.client = add_auth_credentials(self.client)
+        url = self.url + '?days=2'
+        self.client.credentials(HTTP_AUTHORIZATION=self.auth_header)
         actual_response = self.client.get(url)
         self.assertEqual(actual_response.status_code, status.HTTP_200_OK)
-        assert expected_median == actual_response.data['median']
+        assert self.expected_2_days['median'] == actual_response.data['median']
@@ -1,11 +1,11 @@
 """API URL Configurations."""
-from rest_framework.urls import path
-from api.views import get_aggregated_weather_forecast
+from django.urls import path
+from api.views import ForecastView
 
 urlpatterns = [
     path(
         'locations/<str:city>/',
-        get_aggregated_weather_forecast,
+        ForecastView.as_view(),
         name='list-forecast'
     )
 ]
@@ -1,22 +1,31 @@
 """Logic powering weather forecast."""
 import logging
-import math
 
+import numpy as np
+import orjson
 import requests
 from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter, Retry
 from requests.exceptions import HTTPError
 from rest_framework import authentication, permissions, status
-from rest_framework.decorators import (
-    api_view, authentication_classes, permission_classes)
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 LOGGER = logging.getLogger(__name__)
 
+# A shared session keeps TCP connections to the public API alive
+# across requests instead of paying for a new connection handshake
+# on every call.
+SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(
+    pool_connections=10, pool_maxsize=50,
+    max_retries=Retry(total=2, backoff_factor=0.2))
+SESSION.mount('http://', _ADAPTER)
+SESSION.mount('https://', _ADAPTER)
 
-@api_view(['GET'])
-@authentication_classes([authentication.BasicAuthentication])
-@permission_classes([permissions.IsAuthenticated])
-def get_aggregated_weather_forecast(request, city):
+
+class ForecastView(APIView):
     """Get aggregate city-specific weather forecast over a period of time.
 
     The API endpoint expects the client to provide the city name as part
@@ -41,90 +50,105 @@ def get_aggregated_weather_forecast(request, city):
     Limitations
     - THe API can only generate forecasts for a maximum of 14 days.
     """
-    is_valid, data = validate_days(request.query_params.get('days'))
-    if not is_valid:
-        return Response(data, status=status.HTTP_400_BAD_REQUEST)
-
-    payload = {
-        'key': settings.API_KEY,
-        'days': data,
-        'q': city
-    }
 
-    try:
-        response = requests.get(
-            settings.FORECAST_API_URL, params=payload,
-            timeout=settings.API_TIMEOUT_IN_SECONDS)
-        response.raise_for_status()
+    authentication_classes = [authentication.BasicAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
 
-    except HTTPError as exc:
-        LOGGER.error(exc.args[0], exc_info=True)
-        # From the public API documentation, all business errors
-        # will be wrapped under status code 4XX.
-        # https://www.weatherapi.com/docs/#intro-error-codes
-        response_status = status.HTTP_400_BAD_REQUEST
-        msg = process_httperror(exc)
+    def get(self, request, city):
+        """Return the aggregated forecast for the given city."""
+        is_valid, data = validate_days(request.query_params.get('days'))
+        if not is_valid:
+            return Response(data, status=status.HTTP_400_BAD_REQUEST)
 
-    except Exception as exc:
-        LOGGER.error(exc.args[0], exc_info=True)
-        # Mask all other errors as internal server errors.
-        msg = 'Internal server error.'
-        response_status = status.HTTP_500_INTERNAL_SERVER_ERROR
+        payload = {
+            'key': settings.API_KEY,
+            'days': data,
+            'q': city
+        }
 
-    else:
-        response_status = status.HTTP_200_OK
-        msg, error = construct_forecast_payload(response)
+        # Forecast data changes at most hourly, so recent responses are
+        # cached per (city, days) pair to skip the network round-trip.
+        cache_key = f'weather_forecast:{city.lower()}:{data}'
+
+        try:
+            response_json = cache.get(cache_key)
+            if response_json is None:
+                response = SESSION.get(
+                    settings.FORECAST_API_URL, params=payload,
+                    timeout=settings.API_TIMEOUT_IN_SECONDS)
+                response.raise_for_status()
+                # orjson parses the dict-heavy forecast payload a few
+                # times faster than the stdlib json used by .json().
+                response_json = orjson.loads(response.content)
+                cache.set(
+                    cache_key, response_json,
+                    settings.FORECAST_CACHE_TTL_IN_SECONDS)
+
+        except HTTPError as exc:
+            LOGGER.error(exc.args[0], exc_info=True)
+            # From the public API documentation, all business errors
+            # will be wrapped under status code 4XX.
+            # https://www.weatherapi.com/docs/#intro-error-codes
+            return Response(
+                process_httperror(exc), status=status.HTTP_400_BAD_REQUEST)
+
+        except Exception as exc:
+            LOGGER.error(exc.args[0], exc_info=True)
+            # Mask all other errors as internal server errors.
+            return Response(
+                'Internal server error.',
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        msg, error = construct_forecast_payload(response_json)
         if error:
-            response_status = status.HTTP_500_INTERNAL_SERVER_ERROR
+            return Response(msg, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    finally:
-        return Response(msg, status=response_status)
+        return Response(msg, status=status.HTTP_200_OK)
 
 
-def construct_forecast_payload(api_response_object):
+def construct_forecast_payload(response_json):
     """Construct final weather forecast payload."""
     try:
-        daily_forecasts = api_response_object.json()[
-            'forecast']['forecastday']
+        daily_forecasts = response_json['forecast']['forecastday']
         days = len(daily_forecasts)
         # For accuracy, the median temperature is calculated
         # from the hourly temperatures recorded across the
         # days queried.
         record_count = days * 24
-        middle_position = record_count // 2
-        day_index, hour = divmod(middle_position, 24)
-
-        if hour == 0:
-            data_points = ((day_index-1, 23), (day_index, hour))
-        else:
-            data_points = ((day_index, hour-1), (day_index, hour))
-
-        temp1 = daily_forecasts[data_points[0][0]]['hour'][data_points[0][1]]['temp_c']
-        temp2 = daily_forecasts[data_points[1][0]]['hour'][data_points[1][1]]['temp_c']
-
-        median_temp = round((temp1 + temp2)/2, 1)
 
-        # Calculate the maximum, minimum and average temperatures
-        # from the hourly recorded temperatures to enhance accuracy
-        # for floating point operations.
-        max_temp = -math.inf
-        min_temp = math.inf
-        running_sum = 0
-
-        for forecast in daily_forecasts:
-
-            max_temp = max(forecast['day']['maxtemp_c'], max_temp)
-            min_temp = min(forecast['day']['mintemp_c'], min_temp)
-
-            for hourly_forecast in forecast['hour']:
-                running_sum += hourly_forecast['temp_c']
-
-        avg_temp = round(running_sum/record_count, 1)
+        # Extract the hourly recorded temperatures into a single
+        # preallocated float64 array in one walk over the nested
+        # response dicts; every statistic below works off this flat
+        # array rather than chasing back into the dicts.
+        hourly_temps = np.fromiter(
+            (hourly_forecast['temp_c']
+             for forecast in daily_forecasts
+             for hourly_forecast in forecast['hour']),
+            dtype=np.float64, count=record_count)
+
+        # record_count is always an even multiple of 24, so the two
+        # middle hourly samples sit either side of the flat midpoint.
+        middle_position = record_count // 2
+        temp1 = hourly_temps[middle_position - 1]
+        temp2 = hourly_temps[middle_position]
+
+        median_temp = round(float(temp1 + temp2)/2, 1)
+
+        # Calculate the maximum, minimum and average temperatures as
+        # vectorized NumPy reductions. The array never holds more
+        # than 14 * 24 = 336 values, so these reductions already run
+        # as single native passes over L1-resident data; a JIT
+        # compiled kernel would not buy anything here, and fusing
+        # the statistics into one hand-rolled Python loop benchmarks
+        # slower than these separate C-level passes at this size.
+        max_temp = float(hourly_temps.max())
+        min_temp = float(hourly_temps.min())
+        avg_temp = round(float(hourly_temps.mean()), 1)
 
         forecast_data = {
             'maximum': max_temp,
             'minimum': min_temp,
-            'average': round(avg_temp, 1),
+            'average': avg_temp,
             'median': median_temp,
         }
 
@@ -141,25 +165,29 @@ def validate_days(no_of_days):
         msg = 'Number of days has not been supplied.'
         return False, msg
 
-    try:
-        no_of_days = int(no_of_days)
+    # str.isdecimal is a cheap pre-check that avoids raising and
+    # catching a ValueError for every junk input; this runs on
+    # every request before any caching. Unlike str.isdigit, it is
+    # only True for characters int() actually accepts (isdigit also
+    # matches e.g. superscripts, which int() rejects).
+    digits = no_of_days[1:] if no_of_days.startswith('-') else no_of_days
+    if not digits.isdecimal():
+        msg = 'Invalid number of days provided.'
+        return False, msg
 
-        # The public endpoint being used only supports forecasts
-        # up to 14 days.
-        if no_of_days > 14:
-            msg = 'The API can only forecast up to 14 days.'
-            return False, msg
+    no_of_days = int(no_of_days)
 
-        if no_of_days < 1:
-            msg = 'Number of days should range from 1 to 14.'
-            return False, msg
+    # The public endpoint being used only supports forecasts
+    # up to 14 days.
+    if no_of_days > 14:
+        msg = 'The API can only forecast up to 14 days.'
+        return False, msg
 
-    except (TypeError, ValueError):
-        msg = 'Invalid number of days provided.'
+    if no_of_days < 1:
+        msg = 'Number of days should range from 1 to 14.'
         return False, msg
 
-    else:
-        return True, no_of_days
+    return True, no_of_days
 
 
 def process_httperror(exc):
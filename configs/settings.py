@@ -123,5 +123,6 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 API_KEY = 'e1c241b591e248d6bdb172808222709'
 API_BASE_URL = 'http://api.weatherapi.com/v1/'
 API_TIMEOUT_IN_SECONDS = 5
+FORECAST_CACHE_TTL_IN_SECONDS = 600
 FORECAST_API_ENDPOINT = 'forecast.json'
 FORECAST_API_URL = API_BASE_URL + FORECAST_API_ENDPOINT